@@ -1,7 +1,6 @@
 # Reinforcement Learning Agent for Hangman
 import numpy as np
-import random
-from collections import defaultdict
+from hangman_env import VecHangmanEnv
 
 class HangmanRLAgent:
     """
@@ -17,86 +16,139 @@ class HangmanRLAgent:
         self.epsilon_end = epsilon_end
         self.epsilon_decay = epsilon_decay
         
-        self.q_table = defaultdict(lambda: defaultdict(float))
+        self.rng = np.random.default_rng()
+        self.q_table = {}  # state key -> 26-vector of Q-values indexed by letter code
         
-        self.training_stats = {
-            'episodes': [],
-            'rewards': [],
-            'wins': [],
-            'wrong_guesses': [],
+        # Scratch buffers reused by choose_action on every step
+        self._scratch_p = np.empty(26, dtype=np.float64)
+        self._scratch_q = np.empty(26, dtype=np.float32)
+        self._avail_mask = np.empty(26, dtype=bool)
+        self._unavail_mask = np.empty(26, dtype=bool)
+        self._unscored_mask = np.empty(26, dtype=bool)
+        
+        self._reset_training_stats()
+    
+    @property
+    def training_stats(self):
+        """Per-episode statistics of completed episodes (views into the buffers)"""
+        n = self._stats_len
+        return {key: buf[:n] for key, buf in self._stats_buf.items()}
+    
+    def _reset_training_stats(self):
+        """Discard recorded per-episode statistics"""
+        self._stats_buf = {
+            'episodes': np.zeros(0, dtype=np.int64),
+            'rewards': np.zeros(0, dtype=np.float32),
+            'wins': np.zeros(0, dtype=np.int8),
+            'wrong_guesses': np.zeros(0, dtype=np.int16),
         }
+        self._stats_len = 0
+        # Running sums over the last 1000 episodes for progress reports
+        self._recent_wins = 0
+        self._recent_wrong = 0
+    
+    def _reserve_training_stats(self, num_episodes):
+        """Grow the statistics buffers to fit num_episodes more episodes"""
+        n = self._stats_len
+        for key, buf in self._stats_buf.items():
+            grown = np.zeros(n + num_episodes, dtype=buf.dtype)
+            grown[:n] = buf[:n]
+            self._stats_buf[key] = grown
     
     def _get_state_key(self, state):
-        """Convert state to hashable key for Q-table"""
-        masked = state['masked_word']
-        guessed = tuple(sorted(state['guessed_letters']))
-        lives = state['lives_remaining']
-        
-        return (masked, guessed, lives)
+        """Hashable Q-table key for a state (built once by the environment)"""
+        return state['id']
+    
+    def _get_q(self, state_key):
+        """Get Q-value vector for a state, creating it on first visit"""
+        q = self.q_table.get(state_key)
+        if q is None:
+            q = self.q_table[state_key] = np.zeros(26, dtype=np.float32)
+        return q
     
-    def choose_action(self, state, available_actions, training=True):
-        """Choose action using epsilon-greedy policy with HMM guidance"""
-        if not available_actions:
+    def choose_action(self, state, available_actions, training=True, hmm_vec=None):
+        """
+        Choose action using epsilon-greedy policy with HMM guidance
+        available_actions is a 26-bool mask (see env.get_available_mask)
+        or a list of letters; hmm_vec may pass in a precomputed HMM prediction
+        """
+        if isinstance(available_actions, np.ndarray):
+            avail_mask = available_actions
+        else:
+            avail_mask = self._avail_mask
+            avail_mask[:] = False
+            avail_mask[[ord(l) - 97 for l in available_actions]] = True
+        
+        if not avail_mask.any():
             return None
         
-        hmm_probs = self.hmm.predict_letter_probabilities(
-            state['masked_word'],
-            state['guessed_letters']
-        )
+        if hmm_vec is None:
+            hmm_vec = self.hmm.predict_letter_vector(
+                state['masked_word'],
+                state['guessed_letters']
+            )
         
-        if training and random.random() < self.epsilon:
-            letters = [l for l in available_actions if l in hmm_probs]
-            if not letters:
-                return random.choice(available_actions)
+        if training and self.rng.random() < self.epsilon:
+            p = self._scratch_p
+            np.multiply(hmm_vec, avail_mask, out=p)
+            total = p.sum()
+            if total == 0:
+                p[:] = avail_mask
+                total = p.sum()
+            p /= total
             
-            probs = [hmm_probs.get(l, 0.001) for l in letters]
-            total = sum(probs)
-            probs = [p / total for p in probs]
-            
-            return np.random.choice(letters, p=probs)
+            return chr(self.rng.choice(26, p=p) + 97)
         else:
-            state_key = self._get_state_key(state)
-            
-            best_score = -float('inf')
-            best_action = None
+            q = self._get_q(self._get_state_key(state))
             
-            for action in available_actions:
-                q_value = self.q_table[state_key][action]
-                hmm_score = hmm_probs.get(action, 0.001) * 10
-                combined_score = q_value + hmm_score
-                
-                if combined_score > best_score:
-                    best_score = combined_score
-                    best_action = action
+            combined = self._scratch_q
+            np.copyto(combined, hmm_vec)
+            combined[np.less_equal(hmm_vec, 0, out=self._unscored_mask)] = 0.001
+            combined *= 10
+            combined += q
+            combined[np.invert(avail_mask, out=self._unavail_mask)] = -np.inf
             
-            return best_action if best_action else random.choice(available_actions)
+            return chr(combined.argmax() + 97)
     
     def update_q_value(self, state, action, reward, next_state, done):
         """Update Q-value using Q-learning update rule"""
-        state_key = self._get_state_key(state)
+        q = self._get_q(self._get_state_key(state))
+        idx = ord(action) - 97
         
-        current_q = self.q_table[state_key][action]
+        current_q = q[idx]
         
         if done:
             max_next_q = 0
         else:
-            next_state_key = self._get_state_key(next_state)
-            next_q_values = self.q_table[next_state_key]
-            max_next_q = max(next_q_values.values()) if next_q_values else 0
+            max_next_q = self._get_q(self._get_state_key(next_state)).max()
         
-        new_q = current_q + self.learning_rate * (
+        q[idx] = current_q + self.learning_rate * (
             reward + self.discount_factor * max_next_q - current_q
         )
-        
-        self.q_table[state_key][action] = new_q
     
     def decay_epsilon(self):
         """Decay exploration rate"""
         self.epsilon = max(self.epsilon_end, self.epsilon * self.epsilon_decay)
     
-    def train(self, env, num_episodes=10000, verbose=True):
-        """Train agent through self-play"""
+    def train(self, env, num_episodes=10000, verbose=True, num_envs=1, reset_stats=False):
+        """
+        Train agent through self-play
+        With num_envs > 1, episodes are stepped in parallel worker processes
+        while Q-updates stay in this process. Each step costs a pipe round-trip
+        per env, which outweighs the cheap env.step, so num_envs > 1 is
+        currently slower than the serial loop. Statistics accumulate across
+        calls unless reset_stats is set
+        """
         print(f"Starting training for {num_episodes} episodes...")
+        self.hmm.clear_cache()
+        if reset_stats:
+            self._reset_training_stats()
+        self._reserve_training_stats(num_episodes)
+        
+        if num_envs > 1:
+            self._train_vec(env, num_episodes, verbose, num_envs)
+            print("Training complete!")
+            return
         
         for episode in range(num_episodes):
             state = env.reset()
@@ -104,7 +156,7 @@ class HangmanRLAgent:
             wrong_guesses = 0
             
             while not state['game_over']:
-                available = env.get_available_actions()
+                available = env.get_available_mask()
                 action = self.choose_action(state, available, training=True)
                 
                 next_state, reward, done, info = env.step(action)
@@ -117,23 +169,80 @@ class HangmanRLAgent:
                 
                 state = next_state
             
-            self.decay_epsilon()
-            
-            self.training_stats['episodes'].append(episode)
-            self.training_stats['rewards'].append(total_reward)
-            self.training_stats['wins'].append(1 if state['won'] else 0)
-            self.training_stats['wrong_guesses'].append(wrong_guesses)
-            
-            if verbose and (episode + 1) % 1000 == 0:
-                recent_wins = sum(self.training_stats['wins'][-1000:])
-                recent_avg_wrong = np.mean(self.training_stats['wrong_guesses'][-1000:])
-                print(f"Episode {episode + 1}/{num_episodes}")
-                print(f"  Win rate (last 1000): {recent_wins/10:.1f}%")
-                print(f"  Avg wrong guesses: {recent_avg_wrong:.2f}")
-                print(f"  Epsilon: {self.epsilon:.4f}")
+            self._end_episode(episode, num_episodes, total_reward,
+                              state['won'], wrong_guesses, verbose)
         
         print("Training complete!")
     
+    def _train_vec(self, env, num_episodes, verbose, num_envs):
+        """Collect episodes from a VecHangmanEnv and apply Q-updates centrally"""
+        vec_env = VecHangmanEnv(env, num_envs)
+        try:
+            states = vec_env.reset()
+            total_rewards = [0] * num_envs
+            wrong_guesses = [0] * num_envs
+            episode = 0
+            
+            while episode < num_episodes:
+                hmm_vecs = self.hmm.predict_letter_vectors(
+                    [state['masked_word'] for state in states],
+                    [state['guessed_letters'] for state in states]
+                )
+                actions = [self.choose_action(state, state['available_mask'], training=True,
+                                              hmm_vec=hmm_vec)
+                           for state, hmm_vec in zip(states, hmm_vecs)]
+                results = vec_env.step(actions)
+                
+                finished = []
+                for i, (next_state, reward, done, info) in enumerate(results):
+                    total_rewards[i] += reward
+                    if not info['correct'] and not info['repeated']:
+                        wrong_guesses[i] += 1
+                    
+                    self.update_q_value(states[i], actions[i], reward, next_state, done)
+                    states[i] = next_state
+                    
+                    if done:
+                        if episode < num_episodes:
+                            self._end_episode(episode, num_episodes, total_rewards[i],
+                                              next_state['won'], wrong_guesses[i], verbose)
+                            episode += 1
+                        total_rewards[i] = 0
+                        wrong_guesses[i] = 0
+                        finished.append(i)
+                
+                if finished and episode < num_episodes:
+                    for i, state in zip(finished, vec_env.reset(finished)):
+                        states[i] = state
+        finally:
+            vec_env.close()
+    
+    def _end_episode(self, episode, num_episodes, total_reward, won, wrong_guesses, verbose):
+        """Decay exploration and record statistics for a finished episode"""
+        self.decay_epsilon()
+        
+        stats = self._stats_buf
+        idx = self._stats_len
+        stats['episodes'][idx] = episode
+        stats['rewards'][idx] = total_reward
+        stats['wins'][idx] = 1 if won else 0
+        stats['wrong_guesses'][idx] = wrong_guesses
+        self._stats_len += 1
+        
+        self._recent_wins += int(won)
+        self._recent_wrong += wrong_guesses
+        if idx >= 1000:
+            self._recent_wins -= int(stats['wins'][idx - 1000])
+            self._recent_wrong -= int(stats['wrong_guesses'][idx - 1000])
+        
+        if verbose and (episode + 1) % 1000 == 0:
+            recent_wins = self._recent_wins
+            recent_avg_wrong = self._recent_wrong / 1000
+            print(f"Episode {episode + 1}/{num_episodes}")
+            print(f"  Win rate (last 1000): {recent_wins/10:.1f}%")
+            print(f"  Avg wrong guesses: {recent_avg_wrong:.2f}")
+            print(f"  Epsilon: {self.epsilon:.4f}")
+    
     def evaluate(self, env, num_games=1000, verbose=True):
         """Evaluate agent performance"""
         wins = 0
@@ -146,7 +255,7 @@ class HangmanRLAgent:
             repeated_guesses = 0
             
             while not state['game_over']:
-                available = env.get_available_actions()
+                available = env.get_available_mask()
                 action = self.choose_action(state, available, training=False)
                 
                 next_state, reward, done, info = env.step(action)
@@ -1,5 +1,13 @@
 # Hangman Game Environment
 import random
+import multiprocessing as mp
+import numpy as np
+
+_LETTER_BITS = 1 << np.arange(26)
+
+def _is_lowercase_letters(text):
+    """True if text is non-empty and only contains a-z (letter tables index by ord - 97)"""
+    return text.isascii() and text.isalpha() and text.islower()
 
 class HangmanEnvironment:
     """
@@ -11,13 +19,19 @@ class HangmanEnvironment:
         
         with open(word_list_file, 'r') as f:
             self.word_list = [line.strip().lower() for line in f 
-                             if line.strip() and line.strip().isalpha()]
+                             if line.strip() and line.strip().isascii()
+                             and line.strip().isalpha()]
         
         print(f"Loaded {len(self.word_list)} words")
         
         self.target_word = None
-        self.masked_word = None
+        self.letter_positions = None  # letter code -> positions in target_word
+        self._masked = None  # masked word as uint8 ASCII codes
+        self._masked_word = None  # str form of _masked, rebuilt lazily
+        self._unrevealed = 0
         self.guessed_letters = set()
+        self._guessed_frozen = frozenset()  # immutable view shared with states
+        self.guessed_mask = 0  # bit i set = letter chr(97 + i) guessed
         self.wrong_guesses = 0
         self.game_over = False
         self.won = False
@@ -28,9 +42,19 @@ class HangmanEnvironment:
             self.target_word = random.choice(self.word_list)
         else:
             self.target_word = word.lower()
+            if not _is_lowercase_letters(self.target_word):
+                raise ValueError(f"Target word must contain only letters a-z: {word!r}")
+        
+        self.letter_positions = [[] for _ in range(26)]
+        for i, char in enumerate(self.target_word):
+            self.letter_positions[ord(char) - 97].append(i)
         
-        self.masked_word = '_' * len(self.target_word)
+        self._masked = np.full(len(self.target_word), ord('_'), dtype=np.uint8)
+        self._masked_word = '_' * len(self.target_word)
+        self._unrevealed = len(self.target_word)
         self.guessed_letters = set()
+        self._guessed_frozen = frozenset()
+        self.guessed_mask = 0
         self.wrong_guesses = 0
         self.game_over = False
         self.won = False
@@ -40,9 +64,14 @@ class HangmanEnvironment:
     def step(self, letter):
         """Take action (guess a letter)"""
         letter = letter.lower()
+        if len(letter) != 1 or not _is_lowercase_letters(letter):
+            raise ValueError(f"Guess must be a single letter a-z: {letter!r}")
         
         repeated = letter in self.guessed_letters
-        self.guessed_letters.add(letter)
+        if not repeated:
+            self.guessed_letters.add(letter)
+            self._guessed_frozen = self._guessed_frozen | {letter}
+            self.guessed_mask |= 1 << (ord(letter) - 97)
         
         reward = 0
         info = {'repeated': repeated, 'correct': False}
@@ -50,21 +79,19 @@ class HangmanEnvironment:
         if repeated:
             reward = -2
             info['msg'] = f"Already guessed '{letter}'"
-        elif letter in self.target_word:
+        elif self.letter_positions[ord(letter) - 97]:
             info['correct'] = True
             
-            new_masked = list(self.masked_word)
-            occurrences = 0
-            for i, char in enumerate(self.target_word):
-                if char == letter:
-                    new_masked[i] = letter
-                    occurrences += 1
-            self.masked_word = ''.join(new_masked)
+            positions = self.letter_positions[ord(letter) - 97]
+            self._masked[positions] = ord(letter)
+            self._masked_word = None
+            occurrences = len(positions)
+            self._unrevealed -= occurrences
             
             reward = 10 * occurrences
             info['msg'] = f"Correct! '{letter}' appears {occurrences} time(s)"
             
-            if '_' not in self.masked_word:
+            if self._unrevealed == 0:
                 self.won = True
                 self.game_over = True
                 reward += 100
@@ -83,11 +110,20 @@ class HangmanEnvironment:
         
         return state, reward, self.game_over, info
     
+    @property
+    def masked_word(self):
+        """Current masked word, e.g. '_a__e'"""
+        if self._masked_word is None and self._masked is not None:
+            self._masked_word = self._masked.tobytes().decode('ascii')
+        return self._masked_word
+    
     def _get_state(self):
         """Get current state representation"""
+        masked_word = self.masked_word
         return {
-            'masked_word': self.masked_word,
-            'guessed_letters': self.guessed_letters.copy(),
+            'id': (masked_word, self.guessed_mask, self.wrong_guesses),
+            'masked_word': masked_word,
+            'guessed_letters': self._guessed_frozen,
             'wrong_guesses': self.wrong_guesses,
             'lives_remaining': self.max_wrong - self.wrong_guesses,
             'game_over': self.game_over,
@@ -99,3 +135,99 @@ class HangmanEnvironment:
         """Get list of letters that haven't been guessed"""
         all_letters = set('abcdefghijklmnopqrstuvwxyz')
         return list(all_letters - self.guessed_letters)
+    
+    def get_available_mask(self):
+        """Get 26-bool mask of letters that haven't been guessed"""
+        return (self.guessed_mask & _LETTER_BITS) == 0
+
+
+def _vec_env_worker(remote, parent_remote, env):
+    """Run one environment in a child process, serving commands over a pipe"""
+    parent_remote.close()
+    random.seed()  # forked children would otherwise share the parent's RNG state
+    
+    while True:
+        try:
+            cmd, data = remote.recv()
+        except EOFError:  # parent went away
+            break
+        if cmd == 'close':
+            remote.close()
+            break
+        
+        try:
+            if cmd == 'step':
+                state, reward, done, info = env.step(data)
+                state['available_mask'] = env.get_available_mask()
+                remote.send((state, reward, done, info))
+            elif cmd == 'reset':
+                state = env.reset()
+                state['available_mask'] = env.get_available_mask()
+                remote.send(state)
+            else:
+                raise ValueError(f"Unknown command: {cmd!r}")
+        except Exception as e:
+            # Hand the error to the parent instead of leaving it blocked on recv
+            remote.send(e)
+
+
+class VecHangmanEnv:
+    """
+    Runs copies of a HangmanEnvironment in worker processes (SubprocVecEnv-style)
+    States returned by reset/step also carry 'available_mask'
+    """
+    
+    def __init__(self, env, num_envs):
+        self.num_envs = num_envs
+        self.remotes, self.work_remotes = zip(*[mp.Pipe() for _ in range(num_envs)])
+        self.processes = []
+        
+        for work_remote, remote in zip(self.work_remotes, self.remotes):
+            process = mp.Process(target=_vec_env_worker,
+                                 args=(work_remote, remote, env), daemon=True)
+            process.start()
+            work_remote.close()
+            self.processes.append(process)
+        
+        self.closed = False
+    
+    def reset(self, indices=None):
+        """Reset the given environments (all by default), returning their states"""
+        if indices is None:
+            indices = range(self.num_envs)
+        
+        for i in indices:
+            self.remotes[i].send(('reset', None))
+        return self._gather([self.remotes[i] for i in indices])
+    
+    def step(self, actions):
+        """Step every environment with its action, returning (state, reward, done, info) per env"""
+        for remote, action in zip(self.remotes, actions):
+            remote.send(('step', action))
+        return self._gather(self.remotes)
+    
+    @staticmethod
+    def _gather(remotes):
+        """Receive one reply per remote, re-raising the first error a worker sent back"""
+        results = [remote.recv() for remote in remotes]
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+    
+    def close(self):
+        """Shut down the worker processes"""
+        if self.closed:
+            return
+        
+        for remote in self.remotes:
+            try:
+                remote.send(('close', None))
+            except (BrokenPipeError, EOFError):
+                pass  # worker already exited
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.closed = True
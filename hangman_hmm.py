@@ -1,7 +1,59 @@
 # Hidden Markov Model Implementation for Hangman
 import numpy as np
-from collections import defaultdict, Counter
-import pickle
+from collections import defaultdict, OrderedDict
+import os
+import warnings
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; fall back to the NumPy filtering path
+    njit = None
+
+# Candidate sets larger than this are filtered by the multi-threaded kernel
+_PARALLEL_MIN_WORDS = 10_000
+# Memoized predictions kept before the least recently used is evicted
+_PREDICTION_CACHE_SIZE = 200_000
+# Recent candidate sets kept per word length (one per concurrently played game)
+_CANDIDATE_SLOTS = 16
+
+if njit is not None:
+    @njit(cache=True)
+    def _row_matches(word_arr, row, masked_codes, unknown_mask, guessed_mask):
+        """Check one corpus row against the revealed letters and wrong guesses"""
+        for col in range(word_arr.shape[1]):
+            code = np.int64(word_arr[row, col])
+            if unknown_mask[col]:
+                if (guessed_mask >> code) & 1:
+                    return False
+            elif code != masked_codes[col]:
+                return False
+        return True
+    
+    @njit(cache=True)
+    def _match_rows(word_arr, masked_codes, unknown_mask, guessed_mask):
+        """Boolean mask of corpus rows consistent with a pattern"""
+        match = np.empty(word_arr.shape[0], dtype=np.bool_)
+        for row in range(word_arr.shape[0]):
+            match[row] = _row_matches(word_arr, row, masked_codes, unknown_mask, guessed_mask)
+        return match
+    
+    @njit(cache=True, parallel=True)
+    def _match_rows_parallel(word_arr, masked_codes, unknown_mask, guessed_mask):
+        """_match_rows with the rows spread over threads"""
+        match = np.empty(word_arr.shape[0], dtype=np.bool_)
+        for row in prange(word_arr.shape[0]):
+            match[row] = _row_matches(word_arr, row, masked_codes, unknown_mask, guessed_mask)
+        return match
+    
+    @njit(cache=True)
+    def _match_rows_batch(word_arr, masked_codes, unknown_masks, guessed_masks):
+        """_match_rows for a batch of same-length patterns in one scan of word_arr"""
+        match = np.empty((masked_codes.shape[0], word_arr.shape[0]), dtype=np.bool_)
+        for row in range(word_arr.shape[0]):
+            for b in range(masked_codes.shape[0]):
+                match[b, row] = _row_matches(word_arr, row, masked_codes[b],
+                                             unknown_masks[b], guessed_masks[b])
+        return match
 
 class HangmanHMM:
     """
@@ -11,7 +63,11 @@ class HangmanHMM:
     
     def __init__(self):
         self.models = {}  # Dictionary to store HMMs by word length
-        self.letter_frequencies = {}  # Overall letter frequencies by length
+        self.letter_frequencies = {}  # Overall letter frequencies (26-vectors) by length
+        # LRU of predictions keyed on (masked_word, frozenset of guesses)
+        self._predictions = OrderedDict()
+        # Recent (masked_word, guessed, candidates) entries for each word length
+        self._candidate_cache = defaultdict(list)
         
     def train(self, corpus_file='corpus.txt'):
         """Train HMM on corpus"""
@@ -22,7 +78,7 @@ class HangmanHMM:
         # Group words by length
         words_by_length = defaultdict(list)
         for word in words:
-            if word.isalpha():  # Only alphabetic words
+            if word.isascii() and word.isalpha():  # Only alphabetic words
                 words_by_length[len(word)].append(word)
         
         print(f"Training HMMs for {len(words_by_length)} different word lengths...")
@@ -33,149 +89,321 @@ class HangmanHMM:
             self.models[length] = self._train_length_model(word_list, length)
             self.letter_frequencies[length] = self._calculate_frequencies(word_list)
         
+        self.clear_cache()
         print("Training complete!")
     
     def _train_length_model(self, words, length):
         """Train HMM for specific word length"""
-        # Position-based emission probabilities
-        emission_counts = [defaultdict(int) for _ in range(length)]
-        position_totals = [0] * length
+        # Position-based emission probabilities, one row of 26 letters per position
+        emission = np.zeros((length, 26), dtype=np.float32)
         
         for word in words:
             # Count emissions (letter at each position)
             for pos, letter in enumerate(word):
-                emission_counts[pos][letter] += 1
-                position_totals[pos] += 1
+                emission[pos, ord(letter) - 97] += 1
         
         # Convert counts to probabilities
-        emission_probs = []
-        for pos in range(length):
-            pos_probs = {}
-            for letter, count in emission_counts[pos].items():
-                pos_probs[letter] = count / position_totals[pos]
-            emission_probs.append(pos_probs)
+        emission /= emission.sum(axis=1, keepdims=True)
+        
+        # Corpus as a contiguous (n_words, length) matrix of letter codes
+        word_arr = np.frombuffer(''.join(words).encode('ascii'),
+                                 dtype=np.uint8).reshape(-1, length) - 97
         
         return {
-            'emission_probs': emission_probs,
-            'words': words
+            'emission': emission,
+            'word_arr': word_arr
         }
     
     def _calculate_frequencies(self, words):
         """Calculate overall letter frequencies for fallback"""
-        all_letters = ''.join(words)
-        total = len(all_letters)
-        freq = Counter(all_letters)
-        return {letter: count / total for letter, count in freq.items()}
+        buf = np.frombuffer(''.join(words).encode('ascii'), dtype=np.uint8) - 97
+        counts = np.bincount(buf, minlength=26).astype(np.float64)
+        return counts / counts.sum()
     
     def predict_letter_probabilities(self, masked_word, guessed_letters):
         """
         Predict probability distribution over remaining letters
         """
+        probs = self.predict_letter_vector(masked_word, guessed_letters)
+        return {chr(i + 97): float(p) for i, p in enumerate(probs) if p > 0}
+    
+    def predict_letter_vector(self, masked_word, guessed_letters):
+        """
+        Predict probabilities as a 26-vector indexed by letter code (a=0)
+        The returned array is shared with the cache and must not be modified
+        """
+        key = (masked_word, frozenset(guessed_letters))
+        probs = self._predictions.get(key)
+        if probs is None:
+            return self._remember(key, self._predict_scores(*key))
+        
+        self._predictions.move_to_end(key)
+        return probs
+    
+    def predict_letter_vectors(self, masked_words, guessed_letters_list):
+        """
+        Predict probability vectors for a batch of states as a (B, 26) matrix
+        Cached states are looked up; with numba, uncached states that cannot
+        narrow a previous candidate set share one scan of the word matrix
+        """
+        probs = np.empty((len(masked_words), 26), dtype=np.float32)
+        full_scans = defaultdict(dict)  # length -> key -> batch rows
+        
+        for i, (masked_word, guessed) in enumerate(zip(masked_words, guessed_letters_list)):
+            key = (masked_word, frozenset(guessed))
+            cached = self._predictions.get(key)
+            if cached is not None:
+                self._predictions.move_to_end(key)
+                probs[i] = cached
+                continue
+            
+            length = len(masked_word)
+            if njit is None or length not in self.models:
+                probs[i] = self._remember(key, self._predict_scores(*key))
+                continue
+            
+            slot = self._find_candidates(length, *key)
+            if slot is None:
+                full_scans[length].setdefault(key, []).append(i)
+                continue
+            
+            model = self.models[length]
+            candidates = self._narrow_candidates(length, slot, model['word_arr'], *key)
+            probs[i] = self._remember(key, self._score_candidates(model, *key, candidates))
+        
+        for length, rows_by_key in full_scans.items():
+            model = self.models[length]
+            keys = list(rows_by_key)
+            codes = np.frombuffer(''.join(masked_word for masked_word, _ in keys).encode('ascii'),
+                                  dtype=np.uint8).reshape(-1, length)
+            guessed_masks = np.array([self.letter_bits(guessed) for _, guessed in keys],
+                                     dtype=np.int64)
+            match = _match_rows_batch(model['word_arr'], codes.astype(np.int64) - 97,
+                                      codes == ord('_'), guessed_masks)
+            
+            for key, key_match in zip(keys, match):
+                candidates = model['word_arr'][key_match]
+                self._store_candidates(length, None, *key, candidates)
+                probs[rows_by_key[key]] = self._remember(
+                    key, self._score_candidates(model, *key, candidates)
+                )
+        
+        return probs
+    
+    def clear_cache(self):
+        """Drop memoized predictions and cached candidate words"""
+        self._predictions.clear()
+        self._candidate_cache.clear()
+    
+    def _remember(self, key, probs):
+        """Store a freshly computed prediction in the LRU, read-only"""
+        probs.flags.writeable = False
+        self._predictions[key] = probs
+        if len(self._predictions) > _PREDICTION_CACHE_SIZE:
+            self._predictions.popitem(last=False)
+        return probs
+    
+    def _predict_scores(self, masked_word, guessed_letters):
+        """Score and normalize remaining letters for a pattern"""
         length = len(masked_word)
         
         if length not in self.models:
             return self._fallback_probabilities(guessed_letters, length)
         
         model = self.models[length]
-        remaining_letters = set('abcdefghijklmnopqrstuvwxyz') - guessed_letters
         
         # Filter words that match the pattern
-        matching_words = self._filter_matching_words(
-            model['words'], masked_word, guessed_letters
+        matching_words = self._candidate_words(
+            length, model['word_arr'], masked_word, guessed_letters
         )
         
+        return self._score_candidates(model, masked_word, guessed_letters, matching_words)
+    
+    def _score_candidates(self, model, masked_word, guessed_letters, matching_words):
+        """Normalized letter probabilities from the words matching a pattern"""
+        remaining_letters = set('abcdefghijklmnopqrstuvwxyz') - guessed_letters
+        
         if len(matching_words) < 5:
-            letter_scores = self._position_based_scoring(
-                masked_word, model['emission_probs'], remaining_letters
+            scores = self._position_based_scoring(
+                masked_word, model['emission'], remaining_letters
             )
         else:
-            letter_scores = self._frequency_based_scoring(
+            scores = self._frequency_based_scoring(
                 matching_words, masked_word, remaining_letters
             )
         
         # Normalize to probabilities
-        total = sum(letter_scores.values())
+        total = scores.sum()
         if total == 0:
-            return self._fallback_probabilities(guessed_letters, length)
+            return self._fallback_probabilities(guessed_letters, len(masked_word))
         
-        return {letter: score / total for letter, score in letter_scores.items()}
+        return scores / total
     
-    def _filter_matching_words(self, words, masked_word, guessed_letters):
-        """Filter words that match the current pattern"""
-        matching = []
-        for word in words:
-            if len(word) != len(masked_word):
-                continue
-            
-            match = True
-            for i, char in enumerate(masked_word):
-                if char != '_':
-                    if word[i] != char:
-                        match = False
-                        break
-                elif word[i] in guessed_letters:
-                    match = False
-                    break
-            
-            if match:
-                matching.append(word)
+    def _candidate_words(self, length, word_arr, masked_word, guessed_letters):
+        """
+        Words matching the pattern, narrowed from a recent candidate set of
+        this length when the pattern only adds reveals and guesses to it
+        """
+        slot = self._find_candidates(length, masked_word, guessed_letters)
+        return self._narrow_candidates(length, slot, word_arr, masked_word, guessed_letters)
+    
+    def _narrow_candidates(self, length, slot, word_arr, masked_word, guessed_letters):
+        """Filter the cached candidates in slot (or all of word_arr) and store the result"""
+        source = word_arr if slot is None else self._candidate_cache[length][slot][2]
         
-        return matching
+        candidates = self._filter_matching_words(source, masked_word, guessed_letters)
+        self._store_candidates(length, slot, masked_word, guessed_letters, candidates)
+        return candidates
     
-    def _position_based_scoring(self, masked_word, emission_probs, remaining_letters):
-        """Score letters based on position probabilities"""
-        letter_scores = defaultdict(float)
+    def _find_candidates(self, length, masked_word, guessed_letters):
+        """Slot of the smallest cached candidate set the pattern refines, or None"""
+        best = None
+        for slot, (old_masked, old_guessed, candidates) in enumerate(self._candidate_cache[length]):
+            if (self._refines(old_masked, old_guessed, masked_word, guessed_letters)
+                    and (best is None or len(candidates) < best[1])):
+                best = (slot, len(candidates))
+        return None if best is None else best[0]
+    
+    def _store_candidates(self, length, slot, masked_word, guessed_letters, candidates):
+        """Replace the refined slot, or add a slot evicting the oldest"""
+        entries = self._candidate_cache[length]
+        entry = (masked_word, guessed_letters, candidates)
+        if slot is not None:
+            entries[slot] = entry
+        else:
+            entries.append(entry)
+            if len(entries) > _CANDIDATE_SLOTS:
+                entries.pop(0)
+    
+    @staticmethod
+    def _refines(old_masked, old_guessed, masked_word, guessed_letters):
+        """Check whether every word matching the new pattern also matched the old one"""
+        if not old_guessed <= guessed_letters:
+            return False
+        
+        for old_char, char in zip(old_masked, masked_word):
+            if old_char != '_':
+                if char != old_char:
+                    return False
+            elif char != '_' and char in old_guessed:
+                return False
+        return True
+    
+    def _filter_matching_words(self, word_arr, masked_word, guessed_letters):
+        """Filter rows of the word matrix that match the current pattern"""
+        if njit is not None:
+            codes = np.frombuffer(masked_word.encode('ascii'), dtype=np.uint8)
+            match_rows = _match_rows_parallel if len(word_arr) > _PARALLEL_MIN_WORDS else _match_rows
+            return word_arr[match_rows(word_arr, codes.astype(np.int64) - 97, codes == ord('_'),
+                                       self.letter_bits(guessed_letters))]
+        
+        revealed_pos = np.array([i for i, c in enumerate(masked_word) if c != '_'],
+                                dtype=np.intp)
+        revealed_val = np.array([ord(c) - 97 for c in masked_word if c != '_'],
+                                dtype=np.uint8)
+        unknown_pos = np.array([i for i, c in enumerate(masked_word) if c == '_'],
+                               dtype=np.intp)
         
-        for pos, char in enumerate(masked_word):
-            if char == '_':
-                for letter in remaining_letters:
-                    if letter in emission_probs[pos]:
-                        letter_scores[letter] += emission_probs[pos][letter]
+        guessed_mask = self._letter_mask(guessed_letters)
         
-        return letter_scores
+        mask1 = (word_arr[:, revealed_pos] == revealed_val).all(axis=1)
+        mask2 = ~guessed_mask[word_arr[:, unknown_pos]].any(axis=1)
+        
+        return word_arr[mask1 & mask2]
     
-    def _frequency_based_scoring(self, words, masked_word, remaining_letters):
-        """Score letters based on frequency in matching words"""
-        letter_scores = defaultdict(int)
+    def _position_based_scoring(self, masked_word, emission, remaining_letters):
+        """Score letters based on position probabilities (returns 26-vector)"""
+        unknown_mask = np.array([c == '_' for c in masked_word])
+        rem_mask = self._letter_mask(remaining_letters)
         
-        for word in words:
-            for pos, char in enumerate(masked_word):
-                if char == '_':
-                    letter = word[pos]
-                    if letter in remaining_letters:
-                        letter_scores[letter] += 1
+        return emission[unknown_mask].sum(axis=0) * rem_mask
+    
+    def _frequency_based_scoring(self, word_arr, masked_word, remaining_letters):
+        """Score letters based on frequency in matching words (returns 26-vector)"""
+        unknown_pos = np.array([i for i, c in enumerate(masked_word) if c == '_'],
+                               dtype=np.intp)
+        counts = np.bincount(word_arr[:, unknown_pos].ravel(),
+                             minlength=26).astype(np.float32)
+        counts *= self._letter_mask(remaining_letters)
         
-        return letter_scores
+        return counts
+    
+    @staticmethod
+    def letter_bits(letters):
+        """Integer bitmask with bit i set for each letter chr(97 + i)"""
+        bits = 0
+        for letter in letters:
+            bits |= 1 << (ord(letter) - 97)
+        return bits
+    
+    @staticmethod
+    def _letter_mask(letters):
+        """26-element boolean mask with the given letters set"""
+        mask = np.zeros(26, dtype=bool)
+        mask[[ord(l) - 97 for l in letters]] = True
+        return mask
     
     def _fallback_probabilities(self, guessed_letters, length):
         """Fallback to general letter frequencies"""
         if length in self.letter_frequencies:
             freq = self.letter_frequencies[length]
         else:
-            all_freq = {}
-            for freq_dict in self.letter_frequencies.values():
-                for letter, prob in freq_dict.items():
-                    all_freq[letter] = all_freq.get(letter, 0) + prob
-            total = sum(all_freq.values())
-            freq = {k: v / total for k, v in all_freq.items()}
+            all_freq = sum(self.letter_frequencies.values(), np.zeros(26))
+            freq = all_freq / all_freq.sum()
         
         remaining = set('abcdefghijklmnopqrstuvwxyz') - guessed_letters
-        remaining_freq = {letter: freq.get(letter, 0.01) for letter in remaining}
-        total = sum(remaining_freq.values())
-        
-        return {letter: prob / total for letter, prob in remaining_freq.items()}
-    
-    def save(self, filename='hmm_model.pkl'):
-        """Save trained model"""
-        with open(filename, 'wb') as f:
-            pickle.dump({
-                'models': self.models,
-                'letter_frequencies': self.letter_frequencies
-            }, f)
-    
-    def load(self, filename='hmm_model.pkl'):
-        """Load trained model"""
-        with open(filename, 'rb') as f:
-            data = pickle.load(f)
-            self.models = data['models']
-            self.letter_frequencies = data['letter_frequencies']
+        remaining_freq = np.where(freq > 0, freq, 0.01).astype(np.float32)
+        remaining_freq *= self._letter_mask(remaining)
+        total = remaining_freq.sum()
+        if total == 0:
+            return remaining_freq
+        
+        return remaining_freq / total
+    
+    @staticmethod
+    def _model_dir(dirname, filename, method):
+        """Resolve the deprecated filename alias and reject old pickle paths"""
+        if filename is not None:
+            warnings.warn(f"HangmanHMM.{method}(filename=...) is deprecated; use dirname",
+                          DeprecationWarning, stacklevel=3)
+            dirname = filename
+        
+        if dirname.endswith('.pkl') or os.path.isfile(dirname):
+            raise ValueError(
+                f"{dirname!r} looks like a pickled model; HMM models are now saved as a "
+                "directory of .npy arrays, so retrain and save to a directory"
+            )
+        return dirname
+    
+    def save(self, dirname='hmm_model', filename=None):
+        """
+        Save trained model as .npy arrays (emission, words, freq per length)
+        This directory format replaces the old single-file pickle
+        """
+        dirname = self._model_dir(dirname, filename, 'save')
+        os.makedirs(dirname, exist_ok=True)
+        lengths = sorted(self.models)
+        np.save(os.path.join(dirname, 'lengths.npy'), np.array(lengths, dtype=np.int64))
+        
+        for length in lengths:
+            model = self.models[length]
+            np.save(os.path.join(dirname, f'emission_{length}.npy'), model['emission'])
+            np.save(os.path.join(dirname, f'words_{length}.npy'), model['word_arr'])
+            np.save(os.path.join(dirname, f'freq_{length}.npy'), self.letter_frequencies[length])
+    
+    def load(self, dirname='hmm_model', filename=None):
+        """Load trained model, memory-mapping the arrays read-only"""
+        dirname = self._model_dir(dirname, filename, 'load')
+        
+        def load_array(name):
+            return np.load(os.path.join(dirname, name), mmap_mode='r')
+        
+        self.models = {}
+        self.letter_frequencies = {}
+        for length in load_array('lengths.npy').tolist():
+            self.models[length] = {
+                'emission': load_array(f'emission_{length}.npy'),
+                'word_arr': load_array(f'words_{length}.npy')
+            }
+            self.letter_frequencies[length] = load_array(f'freq_{length}.npy')
+        self.clear_cache()
@@ -1,6 +1,12 @@
 # Complete Training Pipeline
+import numpy as np
 import matplotlib.pyplot as plt
 
+def _moving_average(values, window):
+    """Mean of each full window of values (excluding the final window)"""
+    cumsum = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    return (cumsum[window:-1] - cumsum[:-window - 1]) / window
+
 def plot_training_results(agent):
     """Plot training statistics"""
     stats = agent.training_stats
@@ -13,9 +19,7 @@ def plot_training_results(agent):
     ax = axes[0, 0]
     rewards = stats['rewards']
     if len(rewards) >= window:
-        moving_avg = [sum(rewards[i:i+window])/window 
-                     for i in range(len(rewards)-window)]
-        ax.plot(moving_avg)
+        ax.plot(_moving_average(rewards, window))
     ax.set_title('Average Reward (100-episode window)')
     ax.set_xlabel('Episode')
     ax.set_ylabel('Average Reward')
@@ -25,9 +29,7 @@ def plot_training_results(agent):
     ax = axes[0, 1]
     wins = stats['wins']
     if len(wins) >= window:
-        win_rate = [sum(wins[i:i+window])/window * 100 
-                   for i in range(len(wins)-window)]
-        ax.plot(win_rate)
+        ax.plot(_moving_average(wins, window) * 100)
     ax.set_title('Win Rate (100-episode window)')
     ax.set_xlabel('Episode')
     ax.set_ylabel('Win Rate (%)')